@@ -11,24 +11,225 @@ Based on documentation:
 https://learn.microsoft.com/en-us/graph/api/externalconnectors-externalconnection-patch-schema
 """
 
+import functools
+import hashlib
 import json
 import re
+import sys
+from collections import namedtuple
 from datetime import datetime
 
+# Supported datetime formats, fused into one anchored alternation:
+#   YYYY-MM-DDTHH:MM:SS (ISO format, with optional timezone)
+#   YYYY-MM-DD HH:MM:SS, YYYY-MM-DD
+#   YYYY/MM/DD HH:MM:SS, YYYY/MM/DD
+#   MM/DD/YYYY HH:MM:SS, MM/DD/YYYY
+_DATETIME_RE = re.compile(
+    r'^(?:\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}:\d{2}|(?: \d{2}:\d{2}:\d{2})?$)'
+    r'|\d{4}/\d{2}/\d{2}(?: \d{2}:\d{2}:\d{2})?$'
+    r'|\d{2}/\d{2}/\d{4}(?: \d{2}:\d{2}:\d{2})?$)'
+)
+
+# Each alphanumeric word with the separators before it, or trailing separators
+_WORD_RE = re.compile(r'[^a-zA-Z0-9]*([a-zA-Z0-9]+)|[^a-zA-Z0-9]+\Z')
+
+# Optionally signed decimal integers; stricter than int(), which also accepts
+# surrounding whitespace and underscores and limits the number of digits
+_INTEGER_RE = re.compile(r'[+-]?\d+\Z')
+
+# String values longer than this (IDs, descriptions, notes) rarely repeat, so
+# their detected type is not memoized
+_MAX_CACHED_STRING_LENGTH = 32
+
+try:
+    import orjson  # Optional: much faster serialization of the output documents
+except ImportError:
+    orjson = None
+
+
+def _contains_float(obj):
+    """Return True if obj, or any dict value or list item nested in it, is a float."""
+    if isinstance(obj, float):
+        return True
+    if isinstance(obj, dict):
+        return any(_contains_float(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_contains_float(item) for item in obj)
+    return False
+
+
+def _dumps_indented(obj):
+    """
+    Serialize obj as UTF-8 encoded JSON indented by two spaces.
+    Uses orjson when installed, falling back to json for anything orjson would
+    write differently (floats, which it formats and maps NaN differently) or
+    rejects (e.g. integers beyond 64 bits), so the output never depends on it.
+    """
+    if orjson is not None and not _contains_float(obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            pass
+    # backslashreplace writes lone surrogates as \uXXXX escapes, as ensure_ascii would
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8', 'backslashreplace')
+
+
+def _print_and_save_json(obj, path):
+    """Print obj as indented JSON and save the same bytes to path, serializing only once."""
+    data = _dumps_indented(obj)
+    
+    # Text-only streams (io.StringIO, notebooks) have no binary buffer
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if buffer is None:
+        sys.stdout.write(data.decode('utf-8') + '\n')
+    else:
+        # Flush pending print() output so the raw bytes land after it
+        sys.stdout.flush()
+        buffer.write(data + b'\n')
+        buffer.flush()
+    
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _numeric_kind(value, _float=float):
+    """Return "int64" or "double" if the string parses as a number, otherwise None."""
+    if _INTEGER_RE.match(value):
+        return "int64"
+    try:
+        _float(value)
+        return "double"
+    except ValueError:
+        return None
+
+
+def _capitalize_word(match):
+    """Substitute a sanitizer match with its word capitalized, dropping the separators."""
+    word = match.group(1)
+    return word.capitalize() if word else ''
+
+
+@functools.lru_cache(maxsize=4096)
+def _sanitize_property_name(name):
+    """Sanitize a property name; memoized since field names repeat across records."""
+    # Drop non-alphanumeric characters and capitalize the words between them
+    camel_case = _WORD_RE.sub(_capitalize_word, name)
+    
+    if not camel_case:
+        return 'property'
+    
+    # Convert to camelCase: first word lowercase, subsequent words capitalized
+    camel_case = camel_case[0].lower() + camel_case[1:]
+    
+    # Limit length to 32 characters
+    camel_case = camel_case[:32]
+    
+    # Ensure it starts with a letter
+    if camel_case and not camel_case[0].isalpha():
+        camel_case = 'prop' + camel_case.capitalize()
+        camel_case = camel_case[:32]
+    
+    return camel_case or 'property'
+
+
+def _detect_string_type(value):
+    """Detect the Microsoft Graph property type of a non-empty string value."""
+    # Check if it looks like a datetime; every supported format is at
+    # least 10 characters with a separator at index 4 or 2, so most
+    # values can be ruled out without running the regex
+    if (len(value) >= 10 and (value[4] in '-/' or value[2] == '/')
+            and _DATETIME_RE.match(value)):
+        return "dateTime"
+    
+    # Check if it's a numeric string; numbers only start with a digit, sign,
+    # point, whitespace or inf/nan, so skip the exception path for anything else
+    first_char = value[0]
+    if first_char.isdigit() or first_char in '+-.iInN' or first_char.isspace():
+        numeric_kind = _numeric_kind(value)
+        if numeric_kind is not None:
+            return numeric_kind
+    
+    return "string"
+
+
+# Short string values (states, codes, dates) repeat across records
+_detect_short_string_type = functools.lru_cache(maxsize=4096)(_detect_string_type)
+
+
+def _keep_value(value):
+    """Return an externalItem property value unchanged."""
+    return value
+
+
+def _format_list_value(value):
+    """Convert a list to a string array, filtering out empty values."""
+    return [str(item) for item in value if item is not None and str(item).strip()]
+
+
+class PropertyDef(namedtuple('PropertyDef', [
+        'name', 'type', 'isRetrievable', 'isSearchable', 'isQueryable', 'isRefinable', 'labels'],
+        defaults=(True, False, False, False, ()))):
+    """Immutable, compact property definition; converted to a dict only when the schema is assembled."""
+    
+    __slots__ = ()
+    
+    def to_dict(self):
+        """Return the schema property dict, omitting flags that are off and empty labels."""
+        prop_def = {
+            "name": self.name,
+            "type": self.type,
+            "isRetrievable": self.isRetrievable,
+        }
+        if self.isSearchable:
+            prop_def["isSearchable"] = True
+        if self.isQueryable:
+            prop_def["isQueryable"] = True
+        if self.isRefinable:
+            prop_def["isRefinable"] = True
+        if self.labels:
+            prop_def["labels"] = list(self.labels)
+        return prop_def
+
 
 class GraphSchemaGenerator:
     """Generates Microsoft Graph externalItem schemas from JSON data."""
     
+    # Formatters for externalItem property values, keyed by exact type so the
+    # common JSON types resolve with a single dict lookup
+    _VALUE_FORMATTERS = {
+        bool: _keep_value,
+        int: _keep_value,
+        float: _keep_value,
+        str: _keep_value,  # For datetime strings, keep them as strings (Graph will parse them)
+        list: _format_list_value,
+    }
+    
     def __init__(self):
-        self.datetime_patterns = [
-            r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$',  # YYYY-MM-DD HH:MM:SS
-            r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}',   # ISO format (with optional timezone)
-            r'^\d{4}-\d{2}-\d{2}$',                     # YYYY-MM-DD
-            r'^\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}$',  # YYYY/MM/DD HH:MM:SS
-            r'^\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}$',  # MM/DD/YYYY HH:MM:SS
-            r'^\d{4}/\d{2}/\d{2}$',                     # YYYY/MM/DD
-            r'^\d{2}/\d{2}/\d{4}$',                     # MM/DD/YYYY
-        ]
+        # Name keywords that mark commonly queried and categorical fields,
+        # each matched as a substring in a single regex scan
+        self._queryable_re = re.compile('number|id|state|status|priority|category|type')
+        self._refinable_re = re.compile('category|state|status|priority|type|group')
+        
+        # Name keywords that mark url, creator and modifier label candidates
+        self._url_re = re.compile('url|link')
+        self._created_by_re = re.compile('created_by|createdby|author|opener')
+        self._modified_by_re = re.compile('updated_by|updatedby|modified_by|resolver')
+        
+        # Only names starting with one of these prefixes or containing one of
+        # the keywords above can receive a label
+        self._label_name_prefixes = ('short_desc', 'shortdesc', 'title', 'subject', 'sys_created',
+                                     'syscreated', 'sys_updated', 'sysupdated')
+        self._label_keyword_re = re.compile(
+            '|'.join(r.pattern for r in (self._url_re, self._created_by_re, self._modified_by_re))
+        )
+        
+        # Finished (immutable) property definitions keyed by (field name,
+        # property type); nothing else about the value affects the definition
+        self._property_definition_cache = {}
+        
+        # Fields combined (in this order) into the full-text search content
+        self._content_fields = ('number', 'short_description', 'description', 'comments', 'work_notes')
+        self._content_field_set = frozenset(self._content_fields)
     
     def sanitize_property_name(self, name):
         """
@@ -36,26 +237,7 @@ class GraphSchemaGenerator:
         Maximum 32 characters, only alphanumeric characters allowed.
         Converts to camelCase format.
         """
-        # Split on non-alphanumeric characters to get words
-        words = re.findall(r'[a-zA-Z0-9]+', name)
-        
-        if not words:
-            return 'property'
-        
-        # Convert to camelCase: first word lowercase, subsequent words capitalized
-        camel_case = words[0].lower()
-        for word in words[1:]:
-            camel_case += word.capitalize()
-        
-        # Limit length to 32 characters
-        camel_case = camel_case[:32]
-        
-        # Ensure it starts with a letter
-        if camel_case and not camel_case[0].isalpha():
-            camel_case = 'prop' + camel_case.capitalize()
-            camel_case = camel_case[:32]
-        
-        return camel_case or 'property'
+        return _sanitize_property_name(name)
     
     def detect_property_type(self, value):
         """Detect the Microsoft Graph property type based on the value."""
@@ -66,22 +248,9 @@ class GraphSchemaGenerator:
             return "boolean"
         
         if isinstance(value, str):
-            # Check if it looks like a datetime
-            for pattern in self.datetime_patterns:
-                if re.match(pattern, value):
-                    return "dateTime"
-            
-            # Check if it's a numeric string
-            if value.isdigit():
-                return "int64"
-            
-            try:
-                float(value)
-                return "double"
-            except ValueError:
-                pass
-            
-            return "string"
+            if len(value) <= _MAX_CACHED_STRING_LENGTH:
+                return _detect_short_string_type(value)
+            return _detect_string_type(value)
         
         if isinstance(value, int):
             return "int64"
@@ -98,11 +267,13 @@ class GraphSchemaGenerator:
         
         return "string"  # Default fallback
     
-    def determine_labels(self, name, value, property_type):
-        """Determine appropriate labels for the property based on name, value, and type."""
+    def determine_labels(self, name_lower, value, property_type):
+        """Determine appropriate labels for the property based on lowercased name, value, and type."""
         labels = []
         
-        name_lower = name.lower()
+        # Most fields can't be labelled; rule them out before the individual checks
+        if not (name_lower.startswith(self._label_name_prefixes) or self._label_keyword_re.search(name_lower)):
+            return labels
         
         # Title-like fields - be selective to avoid duplicates, prefer short_description
         if name_lower == 'short_description' or name_lower == 'shortdescription':
@@ -111,15 +282,15 @@ class GraphSchemaGenerator:
             labels.append("title")
         
         # URL fields
-        if 'url' in name_lower or 'link' in name_lower:
+        if self._url_re.search(name_lower):
             labels.append("url")
         
         # Creator/author fields (only for string types)
-        if property_type == "string" and any(keyword in name_lower for keyword in ['created_by', 'createdby', 'author', 'opener']):
+        if property_type == "string" and self._created_by_re.search(name_lower):
             labels.append("createdBy")
         
         # Modifier fields (only for string types)
-        if property_type == "string" and any(keyword in name_lower for keyword in ['updated_by', 'updatedby', 'modified_by', 'resolver']):
+        if property_type == "string" and self._modified_by_re.search(name_lower):
             labels.append("lastModifiedBy")
         
         # DateTime fields (only for dateTime types) - be more selective to avoid duplicates
@@ -147,36 +318,36 @@ class GraphSchemaGenerator:
         return str(value)
     
     def create_property_definition(self, name, value):
-        """Create a property definition for the schema."""
-        sanitized_name = self.sanitize_property_name(name)
-        property_type = self.detect_property_type(value)
-        labels = self.determine_labels(name, value, property_type)
-        
-        prop_def = {
-            "name": sanitized_name,
-            "type": property_type,
-            "isRetrievable": True,  # Generally useful for most properties
-        }
-        
-        # Set searchable only for string types
-        if property_type in ["string", "stringCollection"]:
-            prop_def["isSearchable"] = True
+        """Create a PropertyDef for the schema; identical definitions are shared."""
+        return self._create_property_definition_of_type(name, value, self.detect_property_type(value))
+    
+    def _create_property_definition_of_type(self, name, value, property_type):
+        """Create a PropertyDef for a field whose property type is already known."""
+        cache_key = (name, property_type)
+        cached = self._property_definition_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Set queryable for commonly queried fields
-        is_queryable = any(keyword in name.lower() for keyword in ['number', 'id', 'state', 'status', 'priority', 'category', 'type'])
+        sanitized_name = self.sanitize_property_name(name)
+        name_lower = name.lower()
+        labels = self.determine_labels(name_lower, value, property_type)
         
         # Add refinable for categorical data - refinable properties must also be queryable
-        is_refinable = any(keyword in name.lower() for keyword in ['category', 'state', 'status', 'priority', 'type', 'group'])
-        
-        if is_queryable or is_refinable:
-            prop_def["isQueryable"] = True
-            
-        if is_refinable:
-            prop_def["isRefinable"] = True
-        
-        # Add labels if any were determined
-        if labels:
-            prop_def["labels"] = labels
+        is_refinable = self._refinable_re.search(name_lower) is not None
+        
+        prop_def = PropertyDef(
+            name=sanitized_name,
+            type=property_type,
+            isRetrievable=True,  # Generally useful for most properties
+            # Set searchable only for string types
+            isSearchable=property_type in ["string", "stringCollection"],
+            # Set queryable for commonly queried fields
+            isQueryable=is_refinable or self._queryable_re.search(name_lower) is not None,
+            isRefinable=is_refinable,
+            labels=tuple(labels),
+        )
+        
+        self._property_definition_cache[cache_key] = prop_def
         
         return prop_def
     
@@ -193,7 +364,47 @@ class GraphSchemaGenerator:
             else:
                 prop_def = self.create_property_definition(key, value)
             
-            properties.append(prop_def)
+            properties.append(prop_def.to_dict())
+        
+        schema = {
+            "baseType": "microsoft.graph.externalItem",
+            "properties": properties
+        }
+        
+        return schema
+    
+    def generate_schema_batch(self, records):
+        """
+        Generate one Microsoft Graph externalItem schema covering a batch of records.
+        Fields appear in the order they are first seen. Each field's type is reduced
+        across its non-empty values: int64 and double widen to double, any other
+        conflict falls back to string, and fields that are always empty are strings.
+        """
+        column_types = {}
+        
+        for record in records:
+            for key, value in record.items():
+                if isinstance(value, dict) and ('link' in value or 'value' in value):
+                    value = self.process_complex_value(value)
+                
+                if value is None or value == "":
+                    column_types.setdefault(key, None)
+                    continue
+                
+                property_type = self.detect_property_type(value)
+                seen_type = column_types.get(key)
+                if seen_type is None:
+                    column_types[key] = property_type
+                elif seen_type != property_type:
+                    if {seen_type, property_type} == {"int64", "double"}:
+                        column_types[key] = "double"
+                    else:
+                        column_types[key] = "string"
+        
+        properties = [
+            self._create_property_definition_of_type(key, None, property_type or "string").to_dict()
+            for key, property_type in column_types.items()
+        ]
         
         schema = {
             "baseType": "microsoft.graph.externalItem",
@@ -208,8 +419,9 @@ class GraphSchemaGenerator:
         # Generate a unique ID for the item (using sys_id if available, otherwise number)
         item_id = json_data.get('sys_id', json_data.get('number', 'unknown'))
         if not item_id:
-            hash_value = hash(str(json_data)) % 1000000
-            item_id = "incident_" + str(hash_value)
+            # Hash the canonical JSON so the fallback ID is stable across runs
+            canonical = json.dumps(json_data, sort_keys=True, separators=(',', ':'), default=str)
+            item_id = "incident_" + hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).hexdigest()
         
         # Create the properties object based on the schema
         properties = {}
@@ -229,12 +441,13 @@ class GraphSchemaGenerator:
         
         # Create content for full-text search (combine key fields)
         content_parts = []
-        content_fields = ['number', 'short_description', 'description', 'comments', 'work_notes']
+        present_fields = self._content_field_set & json_data.keys()
         
-        for field in content_fields:
-            if field in json_data and json_data[field]:
-                if isinstance(json_data[field], str) and json_data[field].strip():
-                    content_parts.append(json_data[field].strip())
+        for field in self._content_fields:
+            if field in present_fields:
+                value = json_data[field]
+                if isinstance(value, str) and (stripped := value.strip()):
+                    content_parts.append(stripped)
         
         content_text = ' '.join(content_parts) if content_parts else f"ServiceNow Incident {item_id}"
         
@@ -257,13 +470,23 @@ class GraphSchemaGenerator:
         
         return external_item
     
+    def convert_batch(self, records, connection_id="servicenow-incidents"):
+        """Convert a batch of JSON records to Microsoft Graph externalItem format."""
+        return [self.convert_to_external_item(record, connection_id) for record in records]
+    
     def _format_value_for_external_item(self, value):
         """Format a value appropriately for externalItem properties."""
         if value is None:
             return None
         elif value == "":
             return None  # Don't include empty strings
-        elif isinstance(value, bool):
+        
+        formatter = self._VALUE_FORMATTERS.get(type(value))
+        if formatter is not None:
+            return formatter(value)
+        
+        # Subclasses of the basic types fall back to isinstance checks
+        if isinstance(value, bool):
             return value
         elif isinstance(value, (int, float)):
             return value
@@ -271,8 +494,7 @@ class GraphSchemaGenerator:
             # For datetime strings, keep them as strings (Graph will parse them)
             return value
         elif isinstance(value, list):
-            # Convert list to string array, filtering out empty values
-            return [str(item) for item in value if item is not None and str(item).strip()]
+            return _format_list_value(value)
         else:
             return str(value)
 
@@ -424,14 +646,10 @@ def main():
     print("=" * 60)
     schema = generator.generate_schema(sample_data)
     
-    # Output the schema as formatted JSON
+    # Output the schema as formatted JSON and save it to file
     print("Microsoft Graph externalItem Schema:")
     print("=" * 50)
-    print(json.dumps(schema, indent=2))
-    
-    # Save schema to file
-    with open('servicenow_incident_schema.json', 'w') as f:
-        json.dump(schema, f, indent=2)
+    _print_and_save_json(schema, 'servicenow_incident_schema.json')
     
     print(f"\nSchema saved to 'servicenow_incident_schema.json'")
     print(f"Total properties: {len(schema['properties'])}")
@@ -443,14 +661,10 @@ def main():
     # Generate the external item
     external_item = generator.convert_to_external_item(sample_data)
     
-    # Output the external item as formatted JSON
+    # Output the external item as formatted JSON and save it to file
     print("Microsoft Graph externalItem:")
     print("=" * 50)
-    print(json.dumps(external_item, indent=2))
-    
-    # Save external item to file
-    with open('servicenow_incident_external_item.json', 'w') as f:
-        json.dump(external_item, f, indent=2)
+    _print_and_save_json(external_item, 'servicenow_incident_external_item.json')
     
     print(f"\nExternal item saved to 'servicenow_incident_external_item.json'")
     print(f"Item ID: {external_item['id']}")
@@ -0,0 +1,88 @@
+"""Tests for json_to_graph."""
+
+import contextlib
+import io
+import json
+import pickle
+
+import json_to_graph
+from json_to_graph import GraphSchemaGenerator
+
+
+def test_generator_can_be_pickled():
+    generator = GraphSchemaGenerator()
+    generator.generate_schema({"sys_id": "abc", "state": "7"})
+
+    restored = pickle.loads(pickle.dumps(generator))
+
+    assert restored.sanitize_property_name("sys_created_on") == "sysCreatedOn"
+    assert restored.detect_property_type("2021-02-26 00:53:54") == "dateTime"
+
+
+def test_indented_json_does_not_depend_on_orjson(monkeypatch):
+    documents = [
+        {"short_description": "Can’t ü", "id": 2 ** 70},
+        {"score": float("nan"), "ratio": 1e16, "tags": ["a", None, True]},
+    ]
+    with_orjson = [json_to_graph._dumps_indented(doc) for doc in documents]
+
+    monkeypatch.setattr(json_to_graph, "orjson", None)
+
+    assert [json_to_graph._dumps_indented(doc) for doc in documents] == with_orjson
+
+
+def test_numeric_string_types():
+    generator = GraphSchemaGenerator()
+
+    assert generator.detect_property_type("-12") == "int64"
+    assert generator.detect_property_type("12") == "int64"
+    assert generator.detect_property_type("1" * 5000) == "int64"
+    assert generator.detect_property_type("1_000") == "double"
+    assert generator.detect_property_type(" 12") == "double"
+    assert generator.detect_property_type("12\n") == "double"
+    assert generator.detect_property_type("1.5") == "double"
+    assert generator.detect_property_type("INC0000001") == "string"
+
+
+def test_generate_schema_batch_reduces_column_types_in_field_order():
+    records = [
+        {"priority": "1", "opened_at": "", "impact": "1", "score": 1},
+        {"priority": "High", "opened_at": "2014-12-09 23:09:51", "score": 2.5, "urgency": ""},
+        {"priority": "2", "impact": "3", "caller_id": {"link": "https://x", "value": "abc"}},
+    ]
+
+    schema = GraphSchemaGenerator().generate_schema_batch(records)
+
+    types = {prop["name"]: prop["type"] for prop in schema["properties"]}
+    assert list(types) == ["priority", "openedAt", "impact", "score", "urgency", "callerId"]
+    assert types == {
+        "priority": "string",
+        "openedAt": "dateTime",
+        "impact": "int64",
+        "score": "double",
+        "urgency": "string",
+        "callerId": "string",
+    }
+
+
+def test_convert_batch_matches_single_conversion():
+    records = [{"sys_id": "a1", "number": "INC1", "state": "7"}, {"sys_id": "b2", "short_description": "Mail down"}]
+    generator = GraphSchemaGenerator()
+
+    items = generator.convert_batch(records)
+
+    assert items == [generator.convert_to_external_item(record) for record in records]
+    assert [item["id"] for item in items] == ["a1", "b2"]
+
+
+def test_main_prints_to_text_only_stdout(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stdout = io.StringIO()
+
+    with contextlib.redirect_stdout(stdout):
+        json_to_graph.main()
+
+    output = stdout.getvalue()
+    schema_text = (tmp_path / "servicenow_incident_schema.json").read_text(encoding="utf-8")
+    assert "Microsoft Graph externalItem Schema:\n" + "=" * 50 + "\n" + schema_text + "\n" in output
+    assert json.loads(schema_text)["baseType"] == "microsoft.graph.externalItem"